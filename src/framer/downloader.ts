@@ -1,68 +1,366 @@
-import type { PhotoManager } from "./photoLoader";
-import { getExportScale, type PhotoFramerState } from "./state";
+import {
+  EXPORT_FORMAT_EXTENSION,
+  getExportScale,
+  type PhotoFramerState,
+} from "./state";
+import type {
+  WorkerInit,
+  WorkerRelease,
+  WorkerRender,
+  WorkerResult,
+} from "./worker";
+import type { ZipEntry, ZipResult } from "./zipWorker";
 
 export interface DownloadHooks {
   onStatus: (text: string) => void;
   onBusyChange: (busy: boolean) => void;
 }
 
-export const handleDownload = async (
-  state: PhotoFramerState,
-  photoManager: PhotoManager,
-  hooks: DownloadHooks,
-) => {
-  if (!state.frameBitmap || state.photos.length === 0 || state.isProcessing) {
-    return;
-  }
+// Every worker holds its own export-sized frame and canvas. At high
+// quality a large frame costs hundreds of MB per worker, so the pool
+// shrinks to what this budget allows, down to a single worker
+const EXPORT_MEMORY_BUDGET = 512 * 1024 * 1024;
 
-  state.isProcessing = true;
-  hooks.onBusyChange(true);
-  hooks.onStatus("Preparing photos...");
+const getPoolSize = (jobCount: number, frame: ImageBitmap) => {
+  const bytesPerWorker = frame.width * frame.height * 4 * 2;
+  return Math.max(
+    1,
+    Math.min(
+      navigator.hardwareConcurrency || 4,
+      jobCount,
+      Math.floor(EXPORT_MEMORY_BUDGET / bytesPerWorker),
+    ),
+  );
+};
+
+// One photo rendering and the next one decoding on each worker
+const PHOTOS_IN_FLIGHT_PER_WORKER = 2;
 
+interface RenderWorker {
+  worker: Worker;
+  /** Prepared frame this worker last received */
+  frame: ImageBitmap | null;
+  /** The worker itself crashed and can take no more photos */
+  broken: boolean;
+  render: (message: WorkerRender) => Promise<Blob>;
+}
+
+interface PendingRender {
+  resolve: (blob: Blob) => void;
+  reject: (error: Error) => void;
+}
+
+const createRenderWorker = (): RenderWorker => {
   const worker = new Worker(new URL("./worker.ts", import.meta.url), {
     type: "module",
   });
 
-  const photosData: Array<{ name: string; bitmap: ImageBitmap }> = [];
-  for (const photo of state.photos) {
-    const readyBitmap = await photoManager.ensurePhotoReady(photo);
-    const bitmap = await createImageBitmap(readyBitmap);
-    photosData.push({ name: photo.name, bitmap });
-  }
+  // Results are matched back to their request by photo index
+  const pending = new Map<number, PendingRender>();
+  worker.onmessage = (event: MessageEvent<WorkerResult>) => {
+    const { index, blob, error } = event.data;
+    const request = pending.get(index);
+    pending.delete(index);
+    if (blob) {
+      request?.resolve(blob);
+    } else {
+      request?.reject(new Error(error ?? "Photo could not be rendered"));
+    }
+  };
+
+  const renderWorker: RenderWorker = {
+    worker,
+    frame: null,
+    broken: false,
+    render: (message) =>
+      new Promise<Blob>((resolve, reject) => {
+        if (renderWorker.broken) {
+          reject(new Error("Render worker crashed"));
+          return;
+        }
+        pending.set(message.index, { resolve, reject });
+        worker.postMessage(message);
+      }),
+  };
 
-  const frameBitmap = await createImageBitmap(state.frameBitmap);
+  // A crashed worker answers nothing more: fail whatever it still holds
+  // and drop it from the pool so the next download starts a fresh one
+  const fail = () => {
+    renderWorker.broken = true;
+    worker.terminate();
+    const index = workerPool.indexOf(renderWorker);
+    if (index !== -1) workerPool.splice(index, 1);
 
-  worker.onmessage = (event) => {
-    const { type, current, total, blob } = event.data;
-    if (type === "progress") {
-      hooks.onStatus(`Processing ${current}/${total}...`);
-      return;
+    for (const request of pending.values()) {
+      request.reject(new Error("Render worker crashed"));
     }
+    pending.clear();
+  };
+  worker.onerror = fail;
+  worker.onmessageerror = fail;
+
+  return renderWorker;
+};
 
-    if (type === "complete") {
-      const link = document.createElement("a");
-      link.href = URL.createObjectURL(blob);
-      link.download = "framed-photos.zip";
-      link.click();
+// Workers outlive a single download, so exporting again (e.g. after
+// tweaking the sliders) skips worker startup and module loading
+const workerPool: RenderWorker[] = [];
+
+const releaseWorker = (renderWorker: RenderWorker) => {
+  const release: WorkerRelease = { type: "release" };
+  renderWorker.worker.postMessage(release);
+  renderWorker.frame = null;
+};
+
+const acquireWorkers = (count: number) => {
+  while (workerPool.length < count) {
+    workerPool.push(createRenderWorker());
+  }
+  // Workers left out of this export free their frames right away, so a
+  // smaller pool also means less memory held
+  for (const renderWorker of workerPool.slice(count)) {
+    if (renderWorker.frame) releaseWorker(renderWorker);
+  }
+  return workerPool.slice(0, count);
+};
+
+// Zipping CRCs every rendered photo, hundreds of MB at high quality, so it
+// runs in its own worker instead of on the main thread
+const buildZip = async (entries: ZipEntry[]) => {
+  const worker = new Worker(new URL("./zipWorker.ts", import.meta.url), {
+    type: "module",
+  });
+
+  try {
+    return await new Promise<Blob>((resolve, reject) => {
+      worker.onmessage = (event: MessageEvent<ZipResult>) => {
+        const { blob, error } = event.data;
+        if (blob) {
+          resolve(blob);
+        } else {
+          reject(new Error(error ?? "Zip could not be built"));
+        }
+      };
+      worker.onerror = () => reject(new Error("Zip worker crashed"));
+      worker.postMessage(entries);
+    });
+  } finally {
+    worker.terminate();
+  }
+};
+
+// JPEG has no alpha: flatten the frame onto white once here so workers can
+// render on opaque canvases and never clear between photos
+const flattenOntoWhite = (frame: ImageBitmap) => {
+  const canvas = new OffscreenCanvas(frame.width, frame.height);
+  const context = canvas.getContext("2d", { alpha: false });
+  if (!context) {
+    throw new Error("Unable to acquire 2D context");
+  }
+
+  context.fillStyle = "#ffffff";
+  context.fillRect(0, 0, frame.width, frame.height);
+  context.drawImage(frame, 0, 0);
+  frame.close();
+
+  return canvas.transferToImageBitmap();
+};
+
+interface PreparedFrame {
+  source: ImageBitmap;
+  scale: number;
+  flatten: boolean;
+  bitmap: ImageBitmap;
+}
+
+// The export-sized frame of the last download. Exporting the same frame
+// again (another photo set, tweaked sliders) reuses it instead of
+// resampling the full frame every time
+let preparedFrame: PreparedFrame | null = null;
+
+const prepareFrame = async (
+  source: ImageBitmap,
+  scale: number,
+  flatten: boolean,
+) => {
+  if (
+    preparedFrame?.source === source &&
+    preparedFrame.scale === scale &&
+    preparedFrame.flatten === flatten
+  ) {
+    return preparedFrame.bitmap;
+  }
+
+  // Resample the frame to export size once here instead of on every photo
+  // in every worker; each worker receives a clone of the same bitmap
+  const scaledFrame = await createImageBitmap(source, {
+    resizeWidth: Math.round(source.width * scale),
+    resizeHeight: Math.round(source.height * scale),
+    resizeQuality: "high",
+  });
+  const bitmap = flatten ? flattenOntoWhite(scaledFrame) : scaledFrame;
 
-      hooks.onStatus("Done!");
-      state.isProcessing = false;
-      hooks.onBusyChange(false);
-      worker.terminate();
+  preparedFrame?.bitmap.close();
+  preparedFrame = { source, scale, flatten, bitmap };
+  return bitmap;
+};
+
+/** Frees the export-sized frame kept for the next download */
+export const releasePreparedFrame = () => {
+  preparedFrame?.bitmap.close();
+  preparedFrame = null;
+};
+
+// Each worker holds its own export-sized frame and canvas, which add up to
+// gigabytes at high quality. Keep them only while exports follow each
+// other closely, then let the workers free them
+const RELEASE_AFTER_IDLE_MS = 60_000;
+
+let releaseTimer: ReturnType<typeof setTimeout> | undefined;
+
+const releaseExportMemory = () => {
+  releaseTimer = undefined;
+  releasePreparedFrame();
+
+  for (const renderWorker of workerPool) {
+    releaseWorker(renderWorker);
+  }
+};
+
+const exportPhotos = async (
+  state: PhotoFramerState,
+  frameBitmap: ImageBitmap,
+  hooks: DownloadHooks,
+) => {
+  const photos = [...state.photos];
+  const total = photos.length;
+  const settings = JSON.parse(JSON.stringify(state.settings));
+  const exportScale = getExportScale(state.exportQuality);
+  const format = state.exportFormat;
+
+  // An opaque frame covers the whole canvas, so PNG exports get the
+  // alpha-free paths too and JPEG exports have nothing to flatten
+  const opaque = format === "jpeg" || state.frameOpaque;
+  const frame = await prepareFrame(
+    frameBitmap,
+    exportScale,
+    format === "jpeg" && !state.frameOpaque,
+  );
+
+  // Photos are independent, so fan them out across one worker per core,
+  // as far as the frame's memory allows
+  const workers = acquireWorkers(getPoolSize(total, frame));
+
+  const init: WorkerInit = {
+    type: "init",
+    frame,
+    settings,
+    format,
+    opaque,
+  };
+
+  // Workers that already hold this frame only get the new settings,
+  // skipping a full export-sized bitmap copy per worker
+  for (const renderWorker of workers) {
+    renderWorker.worker.postMessage(
+      renderWorker.frame === frame ? { ...init, frame: null } : init,
+    );
+    renderWorker.frame = frame;
+  }
+
+  const blobs = new Array<Blob | undefined>(total);
+  let nextIndex = 0;
+  let completed = 0;
+
+  // Smallest files first, so progress starts moving right away. File
+  // sizes come from the FileList, so sorting reads nothing
+  const order = photos
+    .map((_, index) => index)
+    .sort((a, b) => photos[a].file.size - photos[b].file.size);
+
+  // Each lane pulls the next photo as soon as its previous one is done.
+  // A photo that fails is left out of the zip; a crashed worker ends its
+  // lanes and the others take over the remaining photos
+  const drain = async (renderWorker: RenderWorker) => {
+    while (nextIndex < total && !renderWorker.broken) {
+      const index = order[nextIndex++];
+      const { file, dimensions } = photos[index];
+      try {
+        blobs[index] = await renderWorker.render({
+          type: "render",
+          index,
+          file,
+          // Plain copy: reactive proxies cannot be structured-cloned
+          dimensions: dimensions && { ...dimensions },
+        });
+      } catch {
+        // Counted below from the missing blob
+      }
+
+      completed++;
+      hooks.onStatus(`Processing ${completed}/${total}...`);
     }
   };
 
-  const transferables = [
-    frameBitmap,
-    ...photosData.map((photo) => photo.bitmap),
-  ];
-  worker.postMessage(
-    {
-      frame: frameBitmap,
-      photos: photosData,
-      settings: JSON.parse(JSON.stringify(state.settings)),
-      exportScale: getExportScale(state.exportQuality),
-    },
-    transferables,
+  const lanes = workers.flatMap((renderWorker) =>
+    Array.from({ length: PHOTOS_IN_FLIGHT_PER_WORKER }, () => renderWorker),
+  );
+  await Promise.all(lanes.map(drain));
+
+  // Zip entries keep the original selection order
+  const extension = EXPORT_FORMAT_EXTENSION[format];
+  const entries: ZipEntry[] = [];
+  photos.forEach((photo, index) => {
+    const blob = blobs[index];
+    if (!blob) return;
+    entries.push({
+      name: `${photo.name.replace(/\.[^/.]+$/, "")}-framed.${extension}`,
+      blob,
+    });
+  });
+  const failed = total - entries.length;
+  if (failed === total) {
+    hooks.onStatus("No photos could be processed");
+    return;
+  }
+  hooks.onStatus("Zipping photos...");
+  const content = await buildZip(entries);
+
+  const url = URL.createObjectURL(content);
+  const link = document.createElement("a");
+  link.href = url;
+  link.download = "framed-photos.zip";
+  link.click();
+
+  // The URL pins the whole zip (and every rendered photo in it) in memory
+  // until revoked; give the download time to start first
+  setTimeout(() => URL.revokeObjectURL(url), 5000);
+
+  hooks.onStatus(
+    failed > 0 ? `Done! ${failed} of ${total} photos failed` : "Done!",
   );
 };
+
+export const handleDownload = async (
+  state: PhotoFramerState,
+  hooks: DownloadHooks,
+) => {
+  if (!state.frameBitmap || state.photos.length === 0 || state.isProcessing) {
+    return;
+  }
+
+  clearTimeout(releaseTimer);
+  state.isProcessing = true;
+  hooks.onBusyChange(true);
+  hooks.onStatus("Preparing photos...");
+
+  try {
+    await exportPhotos(state, state.frameBitmap, hooks);
+  } catch {
+    hooks.onStatus("Download failed");
+  } finally {
+    releaseTimer = setTimeout(releaseExportMemory, RELEASE_AFTER_IDLE_MS);
+    state.isProcessing = false;
+    hooks.onBusyChange(false);
+  }
+};
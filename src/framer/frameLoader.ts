@@ -1,4 +1,38 @@
-import type { PhotoFramerState } from "./state";
+import { fitWithin, getScaleQuality } from "@/lib/image";
+
+import { releasePreparedFrame } from "./downloader";
+import { type PhotoFramerState, PREVIEW_MAX_EDGE } from "./state";
+
+// Scans a copy of the decoded frame in a short-lived worker, so a large
+// opaque frame never blocks the page while every pixel is checked
+const checkOpaque = async (bitmap: ImageBitmap) => {
+  const copy = await createImageBitmap(bitmap);
+  const worker = new Worker(new URL("./opacityWorker.ts", import.meta.url), {
+    type: "module",
+  });
+
+  try {
+    return await new Promise<boolean>((resolve) => {
+      worker.onmessage = (event: MessageEvent<boolean>) => resolve(event.data);
+      // Treating the frame as transparent is always safe
+      worker.onerror = () => resolve(false);
+      worker.postMessage(copy, [copy]);
+    });
+  } finally {
+    worker.terminate();
+  }
+};
+
+export const clearFrame = (state: PhotoFramerState) => {
+  if (state.previewFrame !== state.frameBitmap) {
+    state.previewFrame?.close();
+  }
+  state.frameBitmap?.close();
+  state.frameBitmap = null;
+  state.previewFrame = null;
+  state.frameOpaque = false;
+  releasePreparedFrame();
+};
 
 export const loadFrame = async (
   file: File | undefined,
@@ -6,12 +40,37 @@ export const loadFrame = async (
 ) => {
   if (!file) return null;
 
+  const url = URL.createObjectURL(file);
   const img = new Image();
-  img.src = URL.createObjectURL(file);
+  img.src = url;
   await img.decode();
 
-  state.frame = img;
-  state.frameBitmap = await createImageBitmap(img);
+  // Decode once per selected frame; every render reuses the bitmap, so the
+  // element and its own decoded copy are not kept around
+  const bitmap = await createImageBitmap(img);
+  URL.revokeObjectURL(url);
+
+  // Checked once per frame so opaque frames skip alpha handling everywhere
+  const opaque = checkOpaque(bitmap);
+
+  // Resample a large frame down for the previews once here, instead of
+  // filtering every full-resolution pixel on each preview render
+  const previewSize = fitWithin(bitmap, PREVIEW_MAX_EDGE);
+  const previewFrame =
+    previewSize === bitmap
+      ? bitmap
+      : await createImageBitmap(bitmap, {
+          resizeWidth: previewSize.width,
+          resizeHeight: previewSize.height,
+          resizeQuality: getScaleQuality(previewSize.width / bitmap.width),
+        });
+
+  const frameOpaque = await opaque;
+
+  clearFrame(state);
+  state.frameBitmap = bitmap;
+  state.previewFrame = previewFrame;
+  state.frameOpaque = frameOpaque;
 
   return file.name;
 };
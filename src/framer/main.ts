@@ -2,14 +2,19 @@ import { getAlpine, startAlpine } from "@/alpine";
 import { enforcePosterOnlyHosts } from "@/hostRedirect";
 
 import { handleDownload } from "./downloader";
-import { loadFrame } from "./frameLoader";
+import { clearFrame, loadFrame } from "./frameLoader";
 import { createPhotoManager, type PhotoManager } from "./photoLoader";
+import { clearComposites } from "./previewCache";
 import { renderPreviews } from "./previewRenderer";
 import {
   createInitialState,
   type PreviewOrientation,
   resetPreviewIndices,
 } from "./state";
+import {
+  isThumbnailCacheEnabled,
+  setThumbnailCacheEnabled,
+} from "./thumbnailCache";
 
 enforcePosterOnlyHosts();
 
@@ -24,6 +29,7 @@ Alpine.data("photoFramer", () => {
     frameStatus: "No frame selected",
     photoStatus: "No photos selected",
     downloadStatus: "",
+    rememberPreviews: isThumbnailCacheEnabled(),
 
     portraitMeta: "Upload frame & portrait photos",
     landscapeMeta: "Upload frame & landscape photos",
@@ -43,19 +49,23 @@ Alpine.data("photoFramer", () => {
         },
         onPhotosChanged: () => {
           resetPreviewIndices(this.state);
+          clearComposites();
         },
         requestRender: () => this.requestPreview(),
       });
 
+      // Previews render at their on-screen size, so re-render on resize
+      window.addEventListener("resize", () => this.requestPreview());
+
       this.requestPreview();
     },
 
     async onFrameChange(event: Event) {
+      clearComposites();
       const file = (event.target as HTMLInputElement).files?.[0];
       if (!file) {
         this.frameStatus = "No frame selected";
-        this.state.frame = null;
-        this.state.frameBitmap = null;
+        clearFrame(this.state);
         this.requestPreview();
         return;
       }
@@ -70,6 +80,11 @@ Alpine.data("photoFramer", () => {
       this.photoManager?.handleSelection(files);
     },
 
+    onRememberPreviewsChange(event: Event) {
+      this.rememberPreviews = (event.target as HTMLInputElement).checked;
+      setThumbnailCacheEnabled(this.rememberPreviews);
+    },
+
     cyclePreview(type: PreviewOrientation, delta: number) {
       this.state.previewIndex[type] += delta;
       this.requestPreview();
@@ -102,6 +117,7 @@ Alpine.data("photoFramer", () => {
         grouped: this.photoManager.groupPhotosByOrientation(),
         pendingCount: this.photoManager.getPendingCount(),
         anyReady: () => this.photoManager!.anyReady(),
+        requestPhoto: (photo) => this.photoManager!.prioritizePhoto(photo),
       });
 
       this.portraitMeta = uiState.portrait.meta;
@@ -116,7 +132,7 @@ Alpine.data("photoFramer", () => {
     async downloadZip() {
       if (!this.photoManager) return;
 
-      await handleDownload(this.state, this.photoManager, {
+      await handleDownload(this.state, {
         onStatus: (text) => {
           this.downloadStatus = text;
         },
@@ -0,0 +1,30 @@
+// Each strip is a separate readback, so the scan stops at the first
+// transparent strip without copying out the rest of the frame. The canvas
+// itself is still full resolution, which is why this runs off the main
+// thread
+const OPACITY_STRIP_ROWS = 256;
+
+// Whether every pixel of the frame is fully opaque. Stops at the first
+// transparent pixel, which for framed-window PNGs comes early
+const isOpaque = (bitmap: ImageBitmap) => {
+  const canvas = new OffscreenCanvas(bitmap.width, bitmap.height);
+  const ctx = canvas.getContext("2d", { willReadFrequently: true });
+  if (!ctx) return false;
+  ctx.drawImage(bitmap, 0, 0);
+
+  for (let top = 0; top < bitmap.height; top += OPACITY_STRIP_ROWS) {
+    const rows = Math.min(OPACITY_STRIP_ROWS, bitmap.height - top);
+    const { data } = ctx.getImageData(0, top, bitmap.width, rows);
+    for (let i = 3; i < data.length; i += 4) {
+      if (data[i] !== 255) return false;
+    }
+  }
+  return true;
+};
+
+self.onmessage = (e: MessageEvent<ImageBitmap>) => {
+  const bitmap = e.data;
+  const opaque = isOpaque(bitmap);
+  bitmap.close();
+  self.postMessage(opaque);
+};
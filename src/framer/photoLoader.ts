@@ -1,6 +1,36 @@
-import type { PhotoFramerState, PhotoItem, PreviewOrientation } from "./state";
+import {
+  detectOrientation,
+  getScaleQuality,
+  reduceWithin,
+} from "@/lib/image";
+import { readImageDimensions } from "@/lib/imageHeader";
 
-const BATCH_SIZE = 3;
+import {
+  PREVIEW_MAX_EDGE,
+  type PhotoFramerState,
+  type PhotoItem,
+  type PreviewOrientation,
+} from "./state";
+import {
+  pruneThumbnails,
+  readThumbnail,
+  storeThumbnail,
+} from "./thumbnailCache";
+
+const LOAD_CONCURRENCY = 3;
+
+const PROBE_CONCURRENCY = 8;
+
+// Used when the browser reports no MIME type for a picked file
+const IMAGE_EXTENSIONS = new Set(["jpg", "jpeg", "png", "webp", "gif", "bmp"]);
+
+// Decided from the FileList entry alone, without reading the file
+const isImageFile = (file: File) =>
+  file.type
+    ? file.type.startsWith("image/")
+    : IMAGE_EXTENSIONS.has(
+        file.name.slice(file.name.lastIndexOf(".") + 1).toLowerCase(),
+      );
 
 interface PhotoLoaderHooks {
   onStatus: (text: string) => void;
@@ -11,6 +41,7 @@ interface PhotoLoaderHooks {
 export interface PhotoManager {
   handleSelection: (files: FileList | null) => void;
   ensurePhotoReady: (photo: PhotoItem) => Promise<ImageBitmap>;
+  prioritizePhoto: (photo: PhotoItem) => void;
   groupPhotosByOrientation: () => Record<PreviewOrientation, PhotoItem[]>;
   getPendingCount: () => number;
   anyReady: () => boolean;
@@ -20,100 +51,243 @@ export const createPhotoManager = (
   state: PhotoFramerState,
   hooks: PhotoLoaderHooks,
 ): PhotoManager => {
-  let currentToken = 0;
+  // Aborted whenever the selection changes; everything started for the
+  // previous selection checks its signal and stops or drops its result
+  let selection = new AbortController();
+
+  // Kept up to date as photos are probed and decoded, so renders and
+  // progress updates never rescan the whole selection
+  let readyCount = 0;
+  // Photos the browser could not decode; settled like ready ones
+  let failedCount = 0;
+  let grouped: Record<PreviewOrientation, PhotoItem[]> | null = null;
 
   const cleanupPhotos = () => {
     state.photos.forEach((photo) => {
-      URL.revokeObjectURL(photo.url);
       photo.bitmap?.close();
       photo.bitmapPromise = undefined;
     });
   };
 
   const handleSelection = (files: FileList | null) => {
-    const nextFiles = Array.from(files ?? []);
+    const nextFiles = Array.from(files ?? []).filter(isImageFile);
     cleanupPhotos();
 
     state.photos = nextFiles.map((file) => ({
       file,
       name: file.name,
-      url: URL.createObjectURL(file),
     }));
+    readyCount = 0;
+    failedCount = 0;
+    grouped = null;
 
     hooks.onStatus(`${state.photos.length} photos selected`);
     hooks.onPhotosChanged();
     hooks.requestRender();
 
+    // Aborted even for an empty selection so in-flight decodes go stale
+    selection.abort();
+    selection = new AbortController();
     if (state.photos.length === 0) return;
 
-    const loadToken = ++currentToken;
-    void loadPhotosInBackground(loadToken);
+    void loadPhotosInBackground(selection.signal);
   };
 
-  const loadPhotosInBackground = async (token: number) => {
+  const loadPhotosInBackground = async (signal: AbortSignal) => {
     const total = state.photos.length;
     if (total === 0) return;
 
-    for (let i = 0; i < total; i += BATCH_SIZE) {
-      if (token !== currentToken) return;
+    // Header probes are cheap, so every photo lands in its orientation
+    // group before the (much slower) pixel decode starts. Probes only read
+    // a few KB each, so several run at once. The first photo found for
+    // each orientation starts decoding right away and overlaps the rest
+    // of the scan, so a preview has something to show early
+    const sampled = new Set<PreviewOrientation>();
+    let nextProbe = 0;
+    const probeLane = async () => {
+      while (nextProbe < total) {
+        if (signal.aborted) return;
+
+        const photo = state.photos[nextProbe++];
+        await probePhoto(photo);
+
+        if (photo.orientation && !sampled.has(photo.orientation)) {
+          sampled.add(photo.orientation);
+          prioritizePhoto(photo);
+        }
+      }
+    };
+
+    await Promise.all(
+      Array.from({ length: Math.min(PROBE_CONCURRENCY, total) }, probeLane),
+    );
+
+    if (signal.aborted) return;
+    hooks.requestRender();
+
+    // Keep a fixed number of decodes in flight; a lane picks up the next
+    // photo as soon as its previous one finishes, so one slow file no
+    // longer holds back a whole batch
+    let nextIndex = 0;
+    const loadLane = async () => {
+      while (nextIndex < total) {
+        if (signal.aborted) return;
 
-      const batch = state.photos.slice(i, i + BATCH_SIZE);
-      await Promise.all(batch.map((photo) => ensurePhotoReady(photo)));
+        // A photo that fails to decode is already counted; the lane just
+        // moves on to the next one
+        await ensurePhotoReady(state.photos[nextIndex++]).catch(() => {});
 
-      if (token !== currentToken) return;
+        if (signal.aborted) return;
 
-      const loaded = state.photos.filter((photo) => photo.bitmap).length;
-      const status =
-        loaded === total
-          ? `${total} photos ready`
-          : `Loading... ${loaded}/${total}`;
-      hooks.onStatus(status);
+        const status =
+          readyCount + failedCount === total
+            ? getReadyStatus()
+            : `Loading... ${readyCount}/${total}`;
+        hooks.onStatus(status);
+        hooks.requestRender();
+      }
+    };
+
+    await Promise.all(
+      Array.from({ length: Math.min(LOAD_CONCURRENCY, total) }, loadLane),
+    );
+
+    if (!signal.aborted) {
+      hooks.onStatus(getReadyStatus());
       hooks.requestRender();
+      void pruneThumbnails(state.photos.map((photo) => photo.file));
     }
+  };
 
-    if (token === currentToken) {
-      hooks.onStatus(`${state.photos.length} photos ready`);
-      hooks.requestRender();
+  const getReadyStatus = () =>
+    failedCount > 0
+      ? `${readyCount} photos ready, ${failedCount} could not be read`
+      : `${readyCount} photos ready`;
+
+  const probePhoto = async (photo: PhotoItem) => {
+    // A header that cannot be read only leaves the photo for the decode
+    // to classify; it must not stop the other probes and the decodes
+    const dimensions = await readImageDimensions(photo.file).catch(
+      () => null,
+    );
+    if (!dimensions || photo.bitmap) return;
+
+    photo.dimensions = dimensions;
+    photo.orientation = detectOrientation(dimensions.width, dimensions.height);
+    grouped = null;
+  };
+
+  const decodePreview = async (photo: PhotoItem) => {
+    const { dimensions } = photo;
+    if (
+      !dimensions ||
+      Math.max(dimensions.width, dimensions.height) <= PREVIEW_MAX_EDGE
+    ) {
+      return createImageBitmap(photo.file);
     }
+
+    // Only large originals are cached; small ones decode about as fast
+    const cached = await readThumbnail(photo.file);
+    if (cached) return cached;
+
+    // The probed size lets the decoder scale down while decoding instead
+    // of materializing every pixel of a full-resolution photo
+    const target = reduceWithin(dimensions, PREVIEW_MAX_EDGE);
+    // Only the width is forced, so a rotation the probe missed cannot
+    // stretch the photo
+    const bitmap = await createImageBitmap(photo.file, {
+      resizeWidth: target.width,
+      resizeQuality: getScaleQuality(target.width / dimensions.width),
+    });
+    storeThumbnail(photo.file, bitmap);
+    return bitmap;
   };
 
   const ensurePhotoReady = async (photo: PhotoItem) => {
     if (photo.bitmap) return photo.bitmap;
 
     if (!photo.bitmapPromise) {
-      photo.bitmapPromise = createImageBitmap(photo.file).then((bitmap) => {
-        photo.bitmap = bitmap;
-        photo.orientation =
-          bitmap.height > bitmap.width ? "portrait" : "landscape";
-        photo.bitmapPromise = undefined;
-        return bitmap;
-      });
+      const { signal } = selection;
+      photo.bitmapPromise = decodePreview(photo).then(
+        (bitmap) => {
+          // The selection was replaced while decoding; nothing will show it
+          if (signal.aborted) {
+            bitmap.close();
+            return bitmap;
+          }
+
+          photo.bitmap = bitmap;
+          photo.bitmapPromise = undefined;
+          readyCount++;
+
+          // Photos the header probe could not read, or read with the wrong
+          // rotation, change group here. Wrong probed dimensions must not
+          // reach the export either, so it decodes those at full size
+          const orientation = detectOrientation(bitmap.width, bitmap.height);
+          if (orientation !== photo.orientation) {
+            if (photo.orientation) photo.dimensions = undefined;
+            photo.orientation = orientation;
+            grouped = null;
+          }
+          return bitmap;
+        },
+        (error: unknown) => {
+          // Settled all the same, so loading can finish. The photo leaves
+          // its probed group so no preview keeps waiting on it
+          if (!signal.aborted) {
+            failedCount++;
+            photo.orientation = undefined;
+            grouped = null;
+          }
+          throw error;
+        },
+      );
     }
 
     return photo.bitmapPromise;
   };
 
+  // The photo on screen jumps the background queue instead of waiting
+  // for its turn; the render it triggers is dropped if the selection changed
+  const prioritizePhoto = (photo: PhotoItem) => {
+    if (photo.bitmap || photo.bitmapPromise) return;
+
+    const { signal } = selection;
+    void ensurePhotoReady(photo)
+      .catch(() => {
+        // Still re-rendered, so a failed photo drops out of its preview
+      })
+      .then(() => {
+        if (!signal.aborted) hooks.requestRender();
+      });
+  };
+
   const groupPhotosByOrientation = () => {
-    const grouped: Record<PreviewOrientation, PhotoItem[]> = {
+    if (grouped) return grouped;
+
+    const next: Record<PreviewOrientation, PhotoItem[]> = {
       portrait: [],
       landscape: [],
     };
 
     for (const photo of state.photos) {
       if (!photo.orientation) continue;
-      grouped[photo.orientation].push(photo);
+      next[photo.orientation].push(photo);
     }
 
-    return grouped;
+    grouped = next;
+    return next;
   };
 
-  const getPendingCount = () => state.photos.filter((p) => !p.bitmap).length;
+  const getPendingCount = () =>
+    state.photos.length - readyCount - failedCount;
 
-  const anyReady = () => state.photos.some((p) => Boolean(p.bitmap));
+  const anyReady = () => readyCount > 0;
 
   return {
     handleSelection,
     ensurePhotoReady,
+    prioritizePhoto,
     groupPhotosByOrientation,
     getPendingCount,
     anyReady,
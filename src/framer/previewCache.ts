@@ -0,0 +1,68 @@
+import type { CompositionSettings } from "./state";
+
+// Enough for flicking back and forth through a few photos per orientation
+const MAX_ENTRIES = 8;
+
+// Map iteration follows insertion order, so the first key is the oldest
+const composites = new Map<string, ImageBitmap>();
+
+// Stable ids for frames and photo files without holding on to them
+const ids = new WeakMap<object, number>();
+let nextId = 0;
+
+const idOf = (value: object) => {
+  let id = ids.get(value);
+  if (id === undefined) {
+    id = nextId++;
+    ids.set(value, id);
+  }
+  return id;
+};
+
+export const getCompositeKey = (
+  frame: ImageBitmap,
+  photo: File,
+  settings: CompositionSettings,
+  width: number,
+  height: number,
+) =>
+  `${idOf(frame)}:${idOf(photo)}:${settings.scale}:${settings.offset}:${width}x${height}`;
+
+// Key for a canvas that shows only the frame (no photo ready or selected)
+export const getFrameKey = (
+  frame: ImageBitmap,
+  width: number,
+  height: number,
+) => `${idOf(frame)}:${width}x${height}`;
+
+export const takeComposite = (key: string) => {
+  const bitmap = composites.get(key);
+  if (!bitmap) return undefined;
+
+  // Refresh recency
+  composites.delete(key);
+  composites.set(key, bitmap);
+  return bitmap;
+};
+
+export const storeComposite = (key: string, canvas: HTMLCanvasElement) => {
+  if (composites.has(key)) return;
+
+  void createImageBitmap(canvas).then((bitmap) => {
+    composites.get(key)?.close();
+    composites.set(key, bitmap);
+
+    for (const [oldestKey, oldest] of composites) {
+      if (composites.size <= MAX_ENTRIES) break;
+      oldest.close();
+      composites.delete(oldestKey);
+    }
+  });
+};
+
+export const clearComposites = () => {
+  composites.forEach((bitmap) => {
+    bitmap.close();
+  });
+  composites.clear();
+};
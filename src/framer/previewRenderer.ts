@@ -1,9 +1,16 @@
 import {
   calculateTargetSize,
   type Dimensions,
-  type OrientationType,
+  detectOrientation,
+  getScaleQuality,
 } from "@/lib/image";
 
+import {
+  getCompositeKey,
+  getFrameKey,
+  storeComposite,
+  takeComposite,
+} from "./previewCache";
 import {
   type CompositionSettings,
   normalizePreviewIndex,
@@ -20,6 +27,7 @@ interface RenderParams {
   grouped: Record<PreviewOrientation, PhotoItem[]>;
   pendingCount: number;
   anyReady: () => boolean;
+  requestPhoto: (photo: PhotoItem) => void;
 }
 
 export interface PreviewUiState {
@@ -41,11 +49,130 @@ export interface PreviewUiState {
 }
 
 interface RenderContext {
-  frame: HTMLImageElement;
+  frame: CanvasImageSource;
+  frameDims: Dimensions;
   photo: ImageBitmap;
   settings: CompositionSettings;
+  /** Display pixels per frame-space unit */
+  displayScale: number;
+}
+
+/** Backing-store size in physical pixels, plus the size shown in CSS */
+interface DisplaySize extends Dimensions {
+  cssWidth: number;
+  cssHeight: number;
+}
+
+// Size for showing the frame inside the canvas's box. The CSS size fits
+// the frame's aspect ratio into the box, as max-w-full/max-h-full did for
+// a full-size canvas; only the backing store is capped at the frame's own
+// pixels, so HiDPI screens still fill the box
+const getDisplaySize = (
+  canvas: HTMLCanvasElement,
+  frameDims: Dimensions,
+): DisplaySize => {
+  const box = canvas.parentElement;
+  if (!box || box.clientWidth === 0 || box.clientHeight === 0) {
+    return {
+      ...frameDims,
+      cssWidth: frameDims.width,
+      cssHeight: frameDims.height,
+    };
+  }
+
+  const cssRatio = Math.min(
+    1,
+    box.clientWidth / frameDims.width,
+    box.clientHeight / frameDims.height,
+  );
+  const ratio = Math.min(1, cssRatio * devicePixelRatio);
+  return {
+    width: Math.max(1, Math.round(frameDims.width * ratio)),
+    height: Math.max(1, Math.round(frameDims.height * ratio)),
+    cssWidth: frameDims.width * cssRatio,
+    cssHeight: frameDims.height * cssRatio,
+  };
+};
+
+interface DisplayFrame {
+  source: ImageBitmap;
+  canvas: OffscreenCanvas;
 }
 
+// The frame resampled to a preview's display size. Both previews usually
+// share one size, so the frame is filtered once and then copied 1:1 into
+// each canvas instead of being resampled for every preview drawn
+let displayFrame: DisplayFrame | null = null;
+
+const getDisplayFrame = (
+  frame: ImageBitmap,
+  displaySize: Dimensions,
+  opaque: boolean,
+) => {
+  if (
+    displayFrame &&
+    displayFrame.source === frame &&
+    displayFrame.canvas.width === displaySize.width &&
+    displayFrame.canvas.height === displaySize.height
+  ) {
+    return displayFrame.canvas;
+  }
+
+  const canvas = new OffscreenCanvas(displaySize.width, displaySize.height);
+  // Opaque frames are resampled without an alpha channel
+  const ctx = canvas.getContext("2d", { alpha: !opaque });
+  if (!ctx) return frame;
+
+  ctx.imageSmoothingQuality = getScaleQuality(displaySize.width / frame.width);
+  ctx.drawImage(frame, 0, 0, displaySize.width, displaySize.height);
+  displayFrame = { source: frame, canvas };
+  return canvas;
+};
+
+// What each canvas currently shows. Slider input that rounds to the same
+// value, or a resize that keeps the preview size, leaves it untouched
+const drawnKeys = new WeakMap<HTMLCanvasElement, string>();
+
+// Sizes and clears the canvas for new content; false when it already
+// shows exactly that content
+const beginDraw = (
+  canvas: HTMLCanvasElement,
+  ctx: CanvasRenderingContext2D,
+  key: string,
+  displaySize: DisplaySize,
+  frameDims: Dimensions,
+) => {
+  // Styled even when the content is unchanged: with the backing store
+  // capped at the frame, a resized box can keep the same pixel size
+  canvas.style.width = `${displaySize.cssWidth}px`;
+  canvas.style.height = `${displaySize.cssHeight}px`;
+
+  const drawKey = `${key}@${devicePixelRatio}`;
+  if (drawnKeys.get(canvas) === drawKey) return false;
+  drawnKeys.set(canvas, drawKey);
+
+  // Reassigning the size reallocates and resets the canvas even when the
+  // value is unchanged; setTransform and clearRect below cover the reset
+  if (
+    canvas.width !== displaySize.width ||
+    canvas.height !== displaySize.height
+  ) {
+    canvas.width = displaySize.width;
+    canvas.height = displaySize.height;
+  }
+  ctx.setTransform(
+    displaySize.width / frameDims.width,
+    0,
+    0,
+    displaySize.height / frameDims.height,
+    0,
+    0,
+  );
+  ctx.imageSmoothingQuality = "high";
+  ctx.clearRect(0, 0, frameDims.width, frameDims.height);
+  return true;
+};
+
 export const renderPreviews = ({
   state,
   portraitCanvas,
@@ -53,6 +180,7 @@ export const renderPreviews = ({
   grouped,
   pendingCount,
   anyReady,
+  requestPhoto,
 }: RenderParams) => {
   const result: PreviewUiState = {
     portrait: {
@@ -72,10 +200,17 @@ export const renderPreviews = ({
     downloadDisabled: true,
   };
 
-  if (!state.frame) {
+  // Previews draw the decoded bitmap; an <img> may drop its decoded pixels
+  // and decode again on a later draw. Layout is proportional, so the
+  // preview-sized frame defines FRAME SPACE just as the full one would
+  const frame = state.previewFrame;
+  if (!frame) {
     [portraitCanvas, landscapeCanvas].forEach((canvas) => {
+      drawnKeys.delete(canvas);
       canvas.width = 1;
       canvas.height = 1;
+      canvas.style.width = "";
+      canvas.style.height = "";
       canvas.getContext("2d")?.clearRect(0, 0, 1, 1);
     });
 
@@ -85,6 +220,21 @@ export const renderPreviews = ({
     return result;
   }
 
+  // Read once per render instead of once per orientation and compose
+  const frameDims: Dimensions = {
+    width: frame.width,
+    height: frame.height,
+  };
+
+  const { frameOpaque } = state;
+
+  // Measure both boxes before either canvas is touched, so the browser
+  // computes layout once instead of again after the first canvas resizes
+  const displaySizes: Record<PreviewOrientation, DisplaySize> = {
+    portrait: getDisplaySize(portraitCanvas, frameDims),
+    landscape: getDisplaySize(landscapeCanvas, frameDims),
+  };
+
   for (const type of PREVIEW_ORIENTATIONS) {
     const canvas = type === "portrait" ? portraitCanvas : landscapeCanvas;
     const ctx = canvas.getContext("2d");
@@ -96,9 +246,10 @@ export const renderPreviews = ({
     const isTypeLoading =
       matches.length === 0 && state.photos.length > 0 && pendingCount > 0;
 
-    canvas.width = state.frame.naturalWidth;
-    canvas.height = state.frame.naturalHeight;
-    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    // Render at the size the preview is actually shown rather than at full
+    // frame resolution for CSS to shrink; layout stays in FRAME SPACE
+    const displaySize = displaySizes[type];
+    const frameKey = getFrameKey(frame, displaySize.width, displaySize.height);
 
     const out = type === "portrait" ? result.portrait : result.landscape;
     out.count = matches.length;
@@ -115,21 +266,48 @@ export const renderPreviews = ({
       const photoBitmap = matchedPhoto.bitmap;
 
       if (!photoBitmap) {
+        requestPhoto(matchedPhoto);
         out.isLoading = true;
         out.meta = `Loading ${matchedPhoto.name}...`;
-        ctx.drawImage(state.frame, 0, 0);
+        if (beginDraw(canvas, ctx, frameKey, displaySize, frameDims)) {
+          const displayed = getDisplayFrame(frame, displaySize, frameOpaque);
+          ctx.drawImage(displayed, 0, 0, frameDims.width, frameDims.height);
+        }
         continue;
       }
 
       out.isLoading = false;
-      compose(ctx, {
-        frame: state.frame,
-        photo: photoBitmap,
-        settings: state.settings[type],
-      });
+
+      // Revisiting a photo at the same settings and size is a single blit
+      const settings = state.settings[type];
+      const compositeKey = getCompositeKey(
+        frame,
+        matchedPhoto.file,
+        settings,
+        displaySize.width,
+        displaySize.height,
+      );
+      if (beginDraw(canvas, ctx, compositeKey, displaySize, frameDims)) {
+        const cached = takeComposite(compositeKey);
+        if (cached) {
+          ctx.drawImage(cached, 0, 0, frameDims.width, frameDims.height);
+        } else {
+          compose(ctx, {
+            frame: getDisplayFrame(frame, displaySize, frameOpaque),
+            frameDims,
+            photo: photoBitmap,
+            settings,
+            displayScale: displaySize.width / frameDims.width,
+          });
+          storeComposite(compositeKey, canvas);
+        }
+      }
       out.meta = `${matchedPhoto.name} • ${type} (${normalizedIndex + 1}/${matches.length})`;
     } else {
-      ctx.drawImage(state.frame, 0, 0);
+      if (beginDraw(canvas, ctx, frameKey, displaySize, frameDims)) {
+        const displayed = getDisplayFrame(frame, displaySize, frameOpaque);
+        ctx.drawImage(displayed, 0, 0, frameDims.width, frameDims.height);
+      }
       if (isTypeLoading) {
         out.isLoading = true;
         out.meta = `Loading ${type} photos...`;
@@ -148,18 +326,17 @@ export const renderPreviews = ({
 };
 
 const compose = (ctx: CanvasRenderingContext2D, data: RenderContext) => {
-  const frameDims: Dimensions = {
-    width: data.frame.naturalWidth,
-    height: data.frame.naturalHeight,
-  };
+  const { frameDims } = data;
 
   const bitmap = data.photo;
   const orientedDims = {
     width: bitmap.width,
     height: bitmap.height,
   };
-  const orientationType: OrientationType =
-    orientedDims.height > orientedDims.width ? "portrait" : "landscape";
+  const orientationType = detectOrientation(
+    orientedDims.width,
+    orientedDims.height,
+  );
 
   const { width: targetWidth, height: targetHeight } = calculateTargetSize(
     frameDims,
@@ -173,6 +350,14 @@ const compose = (ctx: CanvasRenderingContext2D, data: RenderContext) => {
   const offsetValue = data.settings.offset * frameDims.height;
 
   ctx.drawImage(data.frame, 0, 0, frameDims.width, frameDims.height);
+
+  // Live previews are redrawn on every slider step, so the filter follows
+  // the actual on-screen reduction; export always draws at "high". Small
+  // previews on 1x displays reduce the photo well past 4x, and they get the
+  // mipmapped "medium" filter, never the aliasing "low" one
+  ctx.imageSmoothingQuality = getScaleQuality(
+    (targetWidth * data.displayScale) / bitmap.width,
+  );
   ctx.drawImage(
     bitmap,
     centerX,
@@ -1,3 +1,5 @@
+import type { Dimensions } from "@/lib/image";
+
 export type ExportQuality = "low" | "medium" | "high";
 
 export const EXPORT_QUALITY_SCALE: Record<ExportQuality, number> = {
@@ -6,6 +8,21 @@ export const EXPORT_QUALITY_SCALE: Record<ExportQuality, number> = {
   high: 5,
 };
 
+export type ExportFormat = "png" | "jpeg";
+
+export const EXPORT_FORMAT_TYPE: Record<ExportFormat, string> = {
+  png: "image/png",
+  jpeg: "image/jpeg",
+};
+
+export const EXPORT_FORMAT_EXTENSION: Record<ExportFormat, string> = {
+  png: "png",
+  jpeg: "jpg",
+};
+
+// Previews are shown far smaller than this; export uses the originals
+export const PREVIEW_MAX_EDGE = 2048;
+
 export const PREVIEW_ORIENTATIONS = ["portrait", "landscape"] as const;
 export type PreviewOrientation = (typeof PREVIEW_ORIENTATIONS)[number];
 
@@ -17,7 +34,8 @@ export interface CompositionSettings {
 export interface PhotoItem {
   file: File;
   name: string;
-  url: string;
+  /** Display size read from the file header, before any decoding */
+  dimensions?: Dimensions;
   bitmap?: ImageBitmap;
   orientation?: PreviewOrientation;
   bitmapPromise?: Promise<ImageBitmap>;
@@ -34,24 +52,30 @@ export interface PreviewIndex {
 }
 
 export interface PhotoFramerState {
-  frame: HTMLImageElement | null;
   frameBitmap: ImageBitmap | null;
+  /** The frame at preview resolution; may be frameBitmap itself */
+  previewFrame: ImageBitmap | null;
+  /** Every frame pixel is fully opaque */
+  frameOpaque: boolean;
   photos: PhotoItem[];
   settings: PreviewSettings;
   exportQuality: ExportQuality;
+  exportFormat: ExportFormat;
   previewIndex: PreviewIndex;
   isProcessing: boolean;
 }
 
 export const createInitialState = (): PhotoFramerState => ({
-  frame: null,
   frameBitmap: null,
+  previewFrame: null,
+  frameOpaque: false,
   photos: [],
   settings: {
     portrait: { scale: 0.7, offset: 0 },
     landscape: { scale: 0.9, offset: 0 },
   },
   exportQuality: "medium",
+  exportFormat: "png",
   previewIndex: {
     portrait: 0,
     landscape: 0,
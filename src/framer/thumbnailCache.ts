@@ -0,0 +1,157 @@
+// Preview-sized decodes persist across sessions in Cache Storage, so picking
+// the same photos again skips decoding the full-resolution originals.
+// These are the user's own photos, so the cache is opt-in, entries expire
+// and turning it off deletes everything
+const CACHE_NAME = "framer-thumbnails-v2";
+
+// v1 held thumbnails resampled with the aliasing "low" filter
+const STALE_CACHE_NAMES = ["framer-thumbnails-v1"];
+
+// Remembered per device, off unless the user turns it on
+const ENABLED_KEY = "framer-thumbnails-enabled";
+
+// Roughly a few hundred KB each; past this the oldest entries are dropped
+// so origin storage does not grow with every session
+const MAX_THUMBNAILS = 500;
+
+const MAX_AGE_MS = 7 * 24 * 60 * 60 * 1000;
+
+const STORED_AT_HEADER = "x-stored-at";
+
+const THUMBNAIL_TYPE = "image/webp";
+const THUMBNAIL_QUALITY = 0.8;
+
+// A picked File has no path; name, size and mtime identify it well enough
+const getThumbnailUrl = (file: File) =>
+  `/framer-thumbnails/${encodeURIComponent(file.name)}-${file.size}-${file.lastModified}`;
+
+const isExpired = (response: Response) =>
+  Date.now() - Number(response.headers.get(STORED_AT_HEADER)) > MAX_AGE_MS;
+
+export const isThumbnailCacheEnabled = () => {
+  try {
+    return localStorage.getItem(ENABLED_KEY) === "1";
+  } catch {
+    return false;
+  }
+};
+
+let cachePromise: Promise<Cache> | null = null;
+
+// Cache Storage only exists in secure contexts
+const openCache = () => {
+  if (typeof caches === "undefined" || !isThumbnailCacheEnabled()) {
+    return null;
+  }
+  cachePromise ??= Promise.all(
+    STALE_CACHE_NAMES.map((name) => caches.delete(name)),
+  ).then(() => caches.open(CACHE_NAME));
+  return cachePromise;
+};
+
+/** Deletes every stored thumbnail */
+export const clearThumbnails = async () => {
+  if (typeof caches === "undefined") return;
+  cachePromise = null;
+  await Promise.all(
+    [CACHE_NAME, ...STALE_CACHE_NAMES].map((name) => caches.delete(name)),
+  );
+};
+
+export const setThumbnailCacheEnabled = (enabled: boolean) => {
+  try {
+    if (enabled) {
+      localStorage.setItem(ENABLED_KEY, "1");
+    } else {
+      localStorage.removeItem(ENABLED_KEY);
+    }
+  } catch {
+    // Without storage the cache simply stays off
+  }
+  if (!enabled) void clearThumbnails();
+};
+
+// Stores still encoding; pruning waits for them so it sees every entry
+const pendingStores = new Set<Promise<void>>();
+
+/**
+ * Drops expired thumbnails, then the oldest ones past the cap. Called once
+ * per selection after it finished loading; the photos of that selection
+ * are never evicted, so a large selection still hits next time.
+ */
+export const pruneThumbnails = async (files: File[]) => {
+  const opened = openCache();
+  if (!opened) return;
+
+  try {
+    await Promise.all(pendingStores);
+    const cache = await opened;
+    // Stored keys are absolute; resolve the current ones the same way
+    const current = new Set(
+      files.map((file) => new Request(getThumbnailUrl(file)).url),
+    );
+
+    // Keys come back in insertion order, so the front of the list is oldest
+    const keys = await cache.keys();
+    let excess = keys.length - MAX_THUMBNAILS;
+    for (const key of keys) {
+      const response = await cache.match(key);
+      const evict =
+        !response ||
+        isExpired(response) ||
+        (excess > 0 && !current.has(key.url));
+      if (!evict) continue;
+
+      await cache.delete(key);
+      excess--;
+    }
+  } catch {
+    // Storage errors leave the cache as it was
+  }
+};
+
+export const readThumbnail = async (file: File) => {
+  try {
+    const cache = await openCache();
+    const response = await cache?.match(getThumbnailUrl(file));
+    if (!cache || !response) return null;
+    if (isExpired(response)) {
+      await cache.delete(getThumbnailUrl(file));
+      return null;
+    }
+    return await createImageBitmap(await response.blob());
+  } catch {
+    return null;
+  }
+};
+
+export const storeThumbnail = (file: File, bitmap: ImageBitmap) => {
+  const opened = openCache();
+  if (!opened) return;
+
+  // Copy now: the caller may close the bitmap before encoding finishes
+  const canvas = new OffscreenCanvas(bitmap.width, bitmap.height);
+  const ctx = canvas.getContext("2d");
+  if (!ctx) return;
+  ctx.drawImage(bitmap, 0, 0);
+
+  const store = (async () => {
+    try {
+      const blob = await canvas.convertToBlob({
+        type: THUMBNAIL_TYPE,
+        quality: THUMBNAIL_QUALITY,
+      });
+      const cache = await opened;
+      await cache.put(
+        getThumbnailUrl(file),
+        new Response(blob, {
+          headers: { [STORED_AT_HEADER]: String(Date.now()) },
+        }),
+      );
+    } catch {
+      // Quota or storage errors only cost the next session a decode
+    }
+  })();
+  pendingStores.add(store);
+  void store.then(() => pendingStores.delete(store));
+};
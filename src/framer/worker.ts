@@ -1,116 +1,298 @@
-import JSZip from "jszip";
-
 import {
   calculateTargetSize,
   type Dimensions,
-  type OrientationType,
+  detectOrientation,
 } from "../lib/image";
 
-interface RenderJob {
-  frame: ImageBitmap;
-  photos: Array<{
-    name: string;
-    bitmap: ImageBitmap;
-  }>;
+import { EXPORT_FORMAT_TYPE, type ExportFormat } from "./state";
+
+const JPEG_QUALITY = 0.95;
+
+export interface WorkerInit {
+  type: "init";
+  /**
+   * Frame already resized to the export resolution, or null to keep the
+   * frame (and canvas) from the previous init
+   */
+  frame: ImageBitmap | null;
   settings: {
     portrait: { scale: number; offset: number };
     landscape: { scale: number; offset: number };
   };
-  exportScale: number;
+  format: ExportFormat;
+  /** The frame has no transparency, so the canvas never needs clearing */
+  opaque: boolean;
+}
+
+export interface WorkerRender {
+  type: "render";
+  index: number;
+  file: File;
+  /** Header dimensions, when the format could be probed */
+  dimensions?: Dimensions;
 }
 
-self.onmessage = async (e: MessageEvent<RenderJob>) => {
-  const { frame, photos, settings, exportScale } = e.data;
+export interface WorkerResult {
+  type: "result";
+  index: number;
+  /** Missing when the photo could not be rendered */
+  blob?: Blob;
+  /** Why the photo could not be rendered (e.g. an undecodable file) */
+  error?: string;
+}
 
-  const zip = new JSZip();
+/** Frees the frame and canvas between exports; the next init resends both */
+export interface WorkerRelease {
+  type: "release";
+}
 
-  // Start with a tiny canvas – we will resize per photo
-  const canvas = new OffscreenCanvas(1, 1);
-  const ctx = canvas.getContext("2d");
-  if (!ctx) {
-    throw new Error("Unable to acquire 2D context");
-  }
+type WorkerMessage = WorkerInit | WorkerRelease | WorkerRender;
 
+type RenderJob = WorkerInit & { frame: ImageBitmap };
+
+// Created on init at the frame's export size
+let ctx: OffscreenCanvasRenderingContext2D | null = null;
+
+// Frame + settings are sent once per export and reused for every photo
+let job: RenderJob | null = null;
+
+// Batches usually hold only a few distinct photo sizes, and frame size and
+// settings are fixed per job, so each size maps to exactly one placement
+const layoutCache = new Map<string, PhotoLayout>();
+
+// Tail of the render chain; each photo renders after the one before it
+let renderQueue: Promise<void> = Promise.resolve();
+
+// Area the previous photo was drawn over; the rest still shows the frame
+let dirtyRect: PhotoLayout | null = null;
+
+interface PhotoLayout {
+  x: number;
+  y: number;
+  width: number;
+  height: number;
+}
+
+const computePhotoLayout = (
+  { frame, settings }: RenderJob,
+  photoDims: Dimensions,
+): PhotoLayout => {
+  // The frame arrives already scaled to export resolution, so layout
+  // happens directly in EXPORT SPACE with no per-photo transform
   const frameDims: Dimensions = {
     width: frame.width,
     height: frame.height,
   };
 
-  for (let i = 0; i < photos.length; i++) {
-    const photo = photos[i];
+  const orientationType = detectOrientation(photoDims.width, photoDims.height);
 
-    // Progress update
-    self.postMessage({
-      type: "progress",
-      current: i + 1,
-      total: photos.length,
-    });
+  const currentSettings = settings[orientationType];
+
+  const { width: targetWidth, height: targetHeight } = calculateTargetSize(
+    frameDims,
+    photoDims,
+    currentSettings.scale,
+    orientationType,
+  );
+
+  const centerX = (frameDims.width - targetWidth) / 2;
+  const centerY = (frameDims.height - targetHeight) / 2;
+  const offsetValue = currentSettings.offset * frameDims.height;
+
+  return {
+    x: centerX,
+    y: centerY + offsetValue,
+    width: targetWidth,
+    height: targetHeight,
+  };
+};
+
+const getPhotoLayout = (currentJob: RenderJob, photoDims: Dimensions) => {
+  const sizeKey = `${photoDims.width}x${photoDims.height}`;
+  let layout = layoutCache.get(sizeKey);
+  if (!layout) {
+    layout = computePhotoLayout(currentJob, photoDims);
+    layoutCache.set(sizeKey, layout);
+  }
+  return layout;
+};
+
+const decodePhoto = async (
+  currentJob: RenderJob,
+  file: File,
+  dimensions: Dimensions | undefined,
+) => {
+  if (!dimensions) {
+    const bitmap = await createImageBitmap(file);
+    return { bitmap, layout: getPhotoLayout(currentJob, bitmap) };
+  }
+
+  // With the size known up front the decoder can produce the target size
+  // directly (JPEG IDCT scaling) instead of decoding every source pixel.
+  // Only the width is forced: the decoder keeps the real aspect ratio even
+  // when the header probe missed a rotation (PNG eXIf, WebP EXIF)
+  const { width, height } = getPhotoLayout(currentJob, dimensions);
+  const resizeWidth = Math.max(1, Math.round(width));
+  if (resizeWidth >= dimensions.width || height >= dimensions.height) {
+    const bitmap = await createImageBitmap(file);
+    return { bitmap, layout: getPhotoLayout(currentJob, bitmap) };
+  }
 
-    const photoDims = {
-      width: photo.bitmap.width,
-      height: photo.bitmap.height,
+  const bitmap = await createImageBitmap(file, {
+    resizeWidth,
+    resizeQuality: "high",
+  });
+
+  // A wrong probe also sized the decode for the wrong orientation, so the
+  // photo would be upscaled; decode it again at full size instead
+  if (
+    detectOrientation(bitmap.width, bitmap.height) !==
+    detectOrientation(dimensions.width, dimensions.height)
+  ) {
+    bitmap.close();
+    const fullBitmap = await createImageBitmap(file);
+    return {
+      bitmap: fullBitmap,
+      layout: getPhotoLayout(currentJob, fullBitmap),
     };
+  }
 
-    const orientationType: OrientationType =
-      photoDims.height > photoDims.width ? "portrait" : "landscape";
-
-    const currentSettings = settings[orientationType];
-
-    // Layout math in FRAME SPACE (unchanged)
-    const { width: targetWidth, height: targetHeight } = calculateTargetSize(
-      frameDims,
-      photoDims,
-      currentSettings.scale,
-      orientationType,
-    );
-
-    const centerX = (frameDims.width - targetWidth) / 2;
-    const centerY = (frameDims.height - targetHeight) / 2;
-    const offsetValue = currentSettings.offset * frameDims.height;
-
-    // Resize canvas to final export resolution
-    canvas.width = Math.round(frameDims.width * exportScale);
-    canvas.height = Math.round(frameDims.height * exportScale);
-
-    // Reset + scale context
-    ctx.setTransform(exportScale, 0, 0, exportScale, 0, 0);
-    ctx.imageSmoothingEnabled = true;
-    ctx.imageSmoothingQuality = "high";
-
-    // Clear in FRAME SPACE (not canvas space!)
-    ctx.clearRect(0, 0, frameDims.width, frameDims.height);
-
-    // Draw frame (scaled up automatically)
-    ctx.drawImage(frame, 0, 0);
-
-    // Draw photo (never downscaled)
-    ctx.drawImage(
-      photo.bitmap,
-      centerX,
-      centerY + offsetValue,
-      targetWidth,
-      targetHeight,
-    );
-
-    // Export
-    const blob = await canvas.convertToBlob({
-      type: "image/png",
-      quality: 1,
-    });
+  return { bitmap, layout: getPhotoLayout(currentJob, bitmap) };
+};
 
-    zip.file(`${photo.name.replace(/\.[^/.]+$/, "")}-framed.png`, blob);
+// Put the frame back only where the previous photo touched it, instead of
+// clearing and redrawing the whole export-sized canvas for every photo
+const restoreFrame = (
+  context: OffscreenCanvasRenderingContext2D,
+  { frame, opaque }: RenderJob,
+  rect: PhotoLayout,
+) => {
+  const left = Math.max(0, Math.floor(rect.x));
+  const top = Math.max(0, Math.floor(rect.y));
+  const right = Math.min(frame.width, Math.ceil(rect.x + rect.width));
+  const bottom = Math.min(frame.height, Math.ceil(rect.y + rect.height));
+  if (right <= left || bottom <= top) return;
 
-    // Free memory
-    photo.bitmap.close();
+  const width = right - left;
+  const height = bottom - top;
+  if (!opaque) {
+    context.clearRect(left, top, width, height);
   }
+  context.drawImage(frame, left, top, width, height, left, top, width, height);
+};
 
-  // Free frame bitmap
-  frame.close();
+const renderPhoto = (
+  context: OffscreenCanvasRenderingContext2D,
+  currentJob: RenderJob,
+  bitmap: ImageBitmap,
+  layout: PhotoLayout,
+) => {
+  if (dirtyRect) {
+    restoreFrame(context, currentJob, dirtyRect);
+  }
 
-  const content = await zip.generateAsync({ type: "blob" });
+  // Draw photo (never downscaled)
+  context.drawImage(bitmap, layout.x, layout.y, layout.width, layout.height);
+  dirtyRect = layout;
 
-  self.postMessage({
-    type: "complete",
-    blob: content,
+  // Export. The canvas is snapshotted when the call is made, so the next
+  // photo can be drawn while this one is still encoding
+  return context.canvas.convertToBlob({
+    type: EXPORT_FORMAT_TYPE[currentJob.format],
+    quality: currentJob.format === "jpeg" ? JPEG_QUALITY : 1,
   });
 };
+
+self.onmessage = (e: MessageEvent<WorkerMessage>) => {
+  const message = e.data;
+
+  if (message.type === "release") {
+    job?.frame.close();
+    job = null;
+    ctx = null;
+    layoutCache.clear();
+    dirtyRect = null;
+    return;
+  }
+
+  if (message.type === "init") {
+    layoutCache.clear();
+
+    // Same frame as the previous export: the canvas already holds it and
+    // only the settings (and so the layouts) changed
+    const { frame } = message;
+    if (!frame) {
+      if (job) {
+        job = { ...message, frame: job.frame };
+      }
+      return;
+    }
+
+    job?.frame.close();
+    job = { ...message, frame };
+
+    // Every photo renders at the frame's export size, so allocate the
+    // backing store once instead of resizing (and reallocating) per photo.
+    // Opaque frames get a canvas without an alpha channel
+    const canvas = new OffscreenCanvas(frame.width, frame.height);
+    ctx = canvas.getContext("2d", { alpha: !message.opaque });
+    if (ctx) {
+      ctx.imageSmoothingEnabled = true;
+      ctx.imageSmoothingQuality = "high";
+
+      // Draw frame 1:1, once per job
+      ctx.drawImage(frame, 0, 0);
+    }
+    dirtyRect = null;
+    return;
+  }
+
+  // Every photo gets a result, so a failure never leaves its sender waiting
+  const postResult = (outcome: { blob: Blob } | { error: string }) => {
+    const result: WorkerResult = {
+      type: "result",
+      index: message.index,
+      ...outcome,
+    };
+    self.postMessage(result);
+  };
+  const postError = (error: unknown) =>
+    postResult({
+      error: error instanceof Error ? error.message : String(error),
+    });
+
+  const context = ctx;
+  if (!context) {
+    postError(new Error("Unable to acquire 2D context"));
+    return;
+  }
+  if (!job) {
+    postError(new Error("Worker received a photo before its frame"));
+    return;
+  }
+
+  // Decode straight from the file so the main thread never holds a
+  // full-resolution copy of the photo. Decoding starts on arrival, so the
+  // next photo is already decoding while the current one encodes
+  const currentJob = job;
+  const decoded = decodePhoto(currentJob, message.file, message.dimensions);
+  // Mark a failed decode handled right away: it may fail while earlier
+  // photos still hold the chain. The chain below still sees the rejection
+  // when it reaches this photo and posts the error then
+  decoded.catch(() => {});
+
+  // Drawing shares one canvas, so it runs strictly in arrival order;
+  // encoding is left out of the chain and overlaps the next draw. Errors
+  // are caught per photo so one bad file cannot stall the chain
+  renderQueue = renderQueue
+    .then(async () => {
+      const { bitmap, layout } = await decoded;
+      const encoded = renderPhoto(context, currentJob, bitmap, layout);
+
+      // Free memory
+      bitmap.close();
+
+      void encoded.then((blob) => postResult({ blob }), postError);
+    })
+    .catch(postError);
+};
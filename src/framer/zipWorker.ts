@@ -0,0 +1,26 @@
+import JSZip from "jszip";
+
+export interface ZipEntry {
+  name: string;
+  blob: Blob;
+}
+
+export interface ZipResult {
+  /** Missing when the zip could not be built */
+  blob?: Blob;
+  error?: string;
+}
+
+self.onmessage = async (e: MessageEvent<ZipEntry[]>) => {
+  let result: ZipResult;
+  try {
+    const zip = new JSZip();
+    for (const { name, blob } of e.data) {
+      zip.file(name, blob);
+    }
+    result = { blob: await zip.generateAsync({ type: "blob" }) };
+  } catch (error) {
+    result = { error: error instanceof Error ? error.message : String(error) };
+  }
+  self.postMessage(result);
+};
@@ -17,6 +17,17 @@ export function getOrientationType(
   return height > width ? "portrait" : "landscape";
 }
 
+/**
+ * Classifies dimensions as portrait or landscape, with no square case.
+ * Needs only the size, so header dimensions classify a photo before decode.
+ */
+export function detectOrientation(
+  width: number,
+  height: number,
+): Exclude<OrientationType, "square"> {
+  return height > width ? "portrait" : "landscape";
+}
+
 /**
  * Calculates the target dimensions for an image within a frame
  * based on scaling and aspect ratio preservation.
@@ -53,3 +64,48 @@ export function calculateTargetSize(
 
   return { width: targetWidth, height: targetHeight };
 }
+
+/**
+ * Scales dimensions down so the longest edge is at most `maxEdge`,
+ * preserving aspect ratio. Dimensions that already fit are returned as is.
+ */
+export function fitWithin(size: Dimensions, maxEdge: number): Dimensions {
+  const longest = Math.max(size.width, size.height);
+  if (longest <= maxEdge) return size;
+
+  const ratio = maxEdge / longest;
+  return {
+    width: Math.max(1, Math.round(size.width * ratio)),
+    height: Math.max(1, Math.round(size.height * ratio)),
+  };
+}
+
+/**
+ * Picks a resampling quality for scaling by `ratio` (target / source).
+ * Strong reductions only feed small previews, where the cheaper filter
+ * looks the same as the best one. Never "low": it is plain bilinear with
+ * no mipmaps, which skips most source pixels and aliases badly.
+ */
+export function getScaleQuality(ratio: number): ImageSmoothingQuality {
+  return ratio < 0.5 ? "medium" : "high";
+}
+
+/**
+ * Like `fitWithin`, but only divides by powers of two. Decoders can
+ * produce these sizes directly (JPEG IDCT scaling) with no extra
+ * resampling pass, and the canvas does the final scale when drawing.
+ */
+export function reduceWithin(size: Dimensions, maxEdge: number): Dimensions {
+  const longest = Math.max(size.width, size.height);
+  let factor = 1;
+  while (longest / factor > maxEdge) {
+    factor *= 2;
+  }
+  if (factor === 1) return size;
+
+  // Scaled JPEG decodes round partial blocks up
+  return {
+    width: Math.ceil(size.width / factor),
+    height: Math.ceil(size.height / factor),
+  };
+}
@@ -0,0 +1,172 @@
+import type { Dimensions } from "./image";
+
+// Enough for the SOF marker of typical camera JPEGs, which sits behind
+// the EXIF block (APP1 segments are capped at 64 KiB)
+const HEADER_PROBE_BYTES = 128 * 1024;
+
+const EXIF_ORIENTATION_TAG = 0x0112;
+
+/**
+ * Reads the EXIF orientation tag from the payload of a JPEG APP1 segment.
+ * Returns null when the segment is not EXIF (e.g. XMP, which shares the
+ * APP1 marker), and 1 (identity) when the EXIF block has no tag.
+ */
+function readExifOrientation(
+  view: DataView,
+  start: number,
+  length: number,
+): number | null {
+  const end = Math.min(start + length, view.byteLength);
+  // "Exif\0\0" followed by the TIFF header
+  if (
+    start + 14 > end ||
+    view.getUint32(start) !== 0x45786966 ||
+    view.getUint16(start + 4) !== 0
+  ) {
+    return null;
+  }
+
+  const tiff = start + 6;
+  const littleEndian = view.getUint16(tiff) === 0x4949;
+  const ifd = tiff + view.getUint32(tiff + 4, littleEndian);
+  if (ifd + 2 > end) return 1;
+
+  const entries = view.getUint16(ifd, littleEndian);
+  for (let i = 0; i < entries; i++) {
+    const entry = ifd + 2 + i * 12;
+    if (entry + 12 > end) return 1;
+    if (view.getUint16(entry, littleEndian) === EXIF_ORIENTATION_TAG) {
+      return view.getUint16(entry + 8, littleEndian);
+    }
+  }
+
+  return 1;
+}
+
+const isStartOfFrame = (marker: number) =>
+  marker >= 0xc0 &&
+  marker <= 0xcf &&
+  marker !== 0xc4 &&
+  marker !== 0xc8 &&
+  marker !== 0xcc;
+
+async function readJpegDimensions(
+  file: Blob,
+  probe: DataView,
+): Promise<Dimensions | null> {
+  // From the first EXIF block only; later APP1 segments (XMP) carry none
+  let orientation: number | null = null;
+  let view = probe;
+  // File offset of the first byte in `view`
+  let base = 0;
+  let offset = 2;
+
+  while (true) {
+    // Large APP segments (XMP, embedded previews) can push the frame header
+    // past the probe; seek straight to the next segment instead of giving up
+    if (offset + 9 > view.byteLength) {
+      base += offset;
+      if (base + 4 > file.size) return null;
+
+      const buffer = await file
+        .slice(base, base + HEADER_PROBE_BYTES)
+        .arrayBuffer();
+      view = new DataView(buffer);
+      offset = 0;
+      if (view.byteLength < 4) return null;
+    }
+
+    if (view.getUint8(offset) !== 0xff) return null;
+
+    const marker = view.getUint8(offset + 1);
+    // Fill bytes and standalone markers carry no length
+    if (marker === 0xff) {
+      offset += 1;
+      continue;
+    }
+    if (marker === 0x01 || (marker >= 0xd0 && marker <= 0xd7)) {
+      offset += 2;
+      continue;
+    }
+    // Start of scan: compressed data follows, no frame header was found
+    if (marker === 0xda) return null;
+
+    const length = view.getUint16(offset + 2);
+    if (length < 2) return null;
+    if (marker === 0xe1 && orientation === null) {
+      orientation = readExifOrientation(view, offset + 4, length - 2);
+    }
+
+    if (isStartOfFrame(marker)) {
+      // A file cut off inside its frame header, right after a re-read
+      if (offset + 9 > view.byteLength) return null;
+      const height = view.getUint16(offset + 5);
+      const width = view.getUint16(offset + 7);
+      // Orientations 5-8 rotate by 90°, which swaps the decoded dimensions
+      return orientation !== null && orientation >= 5 && orientation <= 8
+        ? { width: height, height: width }
+        : { width, height };
+    }
+
+    offset += 2 + length;
+  }
+}
+
+function readPngDimensions(view: DataView): Dimensions | null {
+  // Signature (8) + IHDR length (4) + "IHDR" (4) + width (4) + height (4)
+  if (view.byteLength < 24 || view.getUint32(12) !== 0x49484452) return null;
+  return { width: view.getUint32(16), height: view.getUint32(20) };
+}
+
+function readWebpDimensions(view: DataView): Dimensions | null {
+  // "RIFF" size "WEBP", then the first chunk's FourCC and size
+  if (view.byteLength < 30 || view.getUint32(8) !== 0x57454250) return null;
+
+  const chunk = view.getUint32(12);
+  // Lossy: 14-bit sizes after the frame tag and start code
+  if (chunk === 0x56503820) {
+    return {
+      width: view.getUint16(26, true) & 0x3fff,
+      height: view.getUint16(28, true) & 0x3fff,
+    };
+  }
+  // Lossless: signature byte, then width - 1 and height - 1 (14 bits each)
+  if (chunk === 0x5650384c) {
+    const bits = view.getUint32(21, true);
+    return {
+      width: (bits & 0x3fff) + 1,
+      height: ((bits >> 14) & 0x3fff) + 1,
+    };
+  }
+  // Extended: flags, then 24-bit canvas width - 1 and height - 1
+  if (chunk === 0x56503858) {
+    return {
+      width: (view.getUint32(24, true) & 0xffffff) + 1,
+      height: (view.getUint32(26, true) >>> 8) + 1,
+    };
+  }
+
+  return null;
+}
+
+/**
+ * Reads the display dimensions of an image from its header without
+ * decoding any pixels. EXIF orientation is applied the same way the
+ * browser applies it when decoding.
+ *
+ * Returns null for formats the header parser does not understand.
+ */
+export async function readImageDimensions(
+  file: Blob,
+): Promise<Dimensions | null> {
+  const buffer = await file.slice(0, HEADER_PROBE_BYTES).arrayBuffer();
+  const view = new DataView(buffer);
+  if (view.byteLength < 4) return null;
+
+  if (view.getUint16(0) === 0xffd8) return readJpegDimensions(file, view);
+  if (view.getUint32(0) === 0x89504e47) return readPngDimensions(view);
+  // "RIFF"
+  if (view.getUint32(0) === 0x52494646) return readWebpDimensions(view);
+
+  return null;
+}
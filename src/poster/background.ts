@@ -23,6 +23,11 @@ const HQ_NORMALIZE_STD = [1, 1, 1];
 ort.env.wasm.wasmPaths =
   "https://cdn.jsdelivr.net/npm/onnxruntime-web@1.24.1/dist/";
 
+// The float u2netp model runs on the GPU where WebGPU is available; ORT
+// skips providers it cannot initialise, so wasm remains the fallback.
+// The HD model is int8-quantized, which WebGPU kernels mostly lack
+const STANDARD_EXECUTION_PROVIDERS = ["webgpu", "wasm"];
+
 let modelSessionPromise: Promise<ort.InferenceSession> | null = null;
 let processorSessionPromise: Promise<ort.InferenceSession> | null = null;
 let hqModelSessionPromise: Promise<ort.InferenceSession> | null = null;
@@ -30,7 +35,7 @@ let hqModelSessionPromise: Promise<ort.InferenceSession> | null = null;
 const getModelSession = () => {
   if (!modelSessionPromise) {
     modelSessionPromise = ort.InferenceSession.create(ONNX_MODEL_PATH, {
-      executionProviders: ["wasm"],
+      executionProviders: STANDARD_EXECUTION_PROVIDERS,
     });
   }
   return modelSessionPromise;
@@ -91,7 +96,7 @@ const preprocessImage = (
   return new ort.Tensor("float32", pixels, [1, IMAGE_CHANNELS, width, height]);
 };
 
-const applyMaskToImage = (
+const applyMaskToImage = async (
   image: HTMLImageElement,
   resizedMask: Float32Array | ort.Tensor.DataTypeMap[ort.Tensor.Type],
 ) => {
@@ -105,17 +110,24 @@ const applyMaskToImage = (
 
   ctx.drawImage(image, 0, 0);
   const imageData = ctx.getImageData(0, 0, image.width, image.height);
+  const data = imageData.data;
 
-  for (let y = 0; y < image.height; y += 1) {
-    for (let x = 0; x < image.width; x += 1) {
-      const index = (y * image.width + x) * 4;
-      const maskIndex = y * image.width + x;
-      imageData.data[index + 3] = 255 * Number(resizedMask[maskIndex]);
-    }
+  const pixelCount = image.width * image.height;
+  for (let i = 0; i < pixelCount; i += 1) {
+    data[i * 4 + 3] = 255 * Number(resizedMask[i]);
   }
 
   ctx.putImageData(imageData, 0, 0);
-  return canvas.toDataURL("image/png");
+
+  // A blob URL skips base64-encoding the PNG into a string (synchronously,
+  // on the main thread) only for the <img> to decode it back out again
+  const blob = await new Promise<Blob | null>((resolve) => {
+    canvas.toBlob(resolve, "image/png");
+  });
+  if (!blob) {
+    throw new Error("Unable to encode image.");
+  }
+  return URL.createObjectURL(blob);
 };
 
 const normalizeMask = (mask: ArrayLike<number>) => {
@@ -294,6 +306,10 @@ const removeBackgroundHighQuality = async (photoSrc: string) => {
 
 export type BackgroundRemovalQuality = "standard" | "hq";
 
+/**
+ * Returns an object URL for the cut-out photo; the caller owns it and
+ * must revoke it once it is no longer shown.
+ */
 export async function removeBackground(
   photoSrc: string,
   quality: BackgroundRemovalQuality = "standard",
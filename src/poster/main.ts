@@ -679,9 +679,11 @@ Alpine.data("posterBuilder", () => {
         window.requestAnimationFrame(() => resolve());
       });
 
+      const removal = removeBackgroundImage(this.photoSrc, quality);
+
       try {
         const processedSource = await Promise.race([
-          removeBackgroundImage(this.photoSrc, quality),
+          removal,
           new Promise<string>((_, reject) => {
             timeoutHandle = window.setTimeout(() => {
               reject(new Error("Background removal timed out."));
@@ -690,13 +692,14 @@ Alpine.data("posterBuilder", () => {
         ]);
 
         if (runId !== removeBgRunId) {
+          URL.revokeObjectURL(processedSource);
           return;
         }
 
         if (currentPhotoObjectUrl) {
           URL.revokeObjectURL(currentPhotoObjectUrl);
-          currentPhotoObjectUrl = null;
         }
+        currentPhotoObjectUrl = processedSource;
 
         this.photoSrc = processedSource;
         this.removeBgQualityUsed = quality;
@@ -704,6 +707,12 @@ Alpine.data("posterBuilder", () => {
           ? "Background removed (HD)"
           : "Background removed";
       } catch (error) {
+        // After a timeout the removal still finishes later; nothing will
+        // ever show its blob URL, so release it then
+        void removal.then(
+          (source) => URL.revokeObjectURL(source),
+          () => {},
+        );
         console.error("Error during background removal:", error);
         if (runId === removeBgRunId) {
           this.removeBgMessage = isHighQuality